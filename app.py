@@ -2,18 +2,60 @@ import nbformat
 from nbformat.v4 import new_notebook, new_markdown_cell, new_code_cell
 from groq import Groq
 import os
+import json
 from typing import List, Dict
 from dotenv import load_dotenv
 load_dotenv() 
 
+# The cell prompt is split around the current code so the large notebook
+# context is formatted once per notebook rather than once per cell
+PROMPT_TEMPLATE_HEAD = """As an expert data scientist documenting your work, briefly explain what this code does in the context of the notebook's workflow.
+Write naturally as if documenting your own work, not as an AI,
+if it is null cell dont generate anything and generate text based on complexity and length of the code present in the cell.
+
+Full notebook context:
+```python
+{full_context}
+```"""
+
+PROMPT_TEMPLATE_TAIL = """
+Requirements:
+- Write in third person technical documentation style
+- No "This code..." or "Here we..." phrases
+- Be extremely concise - even one phrase is fine if it captures the point
+- Focus only on meaningful operations
+- Mention variable names only if crucial
+- Skip obvious operations
+
+Example good responses:
+- "Normalizes features using StandardScaler"
+- "Extracts timestamp from log entries for temporal analysis"
+- "Merges preprocessed datasets on user_id"
+- "Custom function to handle missing GPS coordinates"
+
+Example bad responses:
+- "This code performs..."
+- "Here we can see..."
+- "This cell is about..."
+- Any obvious/redundant explanations"""
+
 class NotebookDocumenter:
     def __init__(self, api_key: str):
         self.client = Groq(api_key=api_key)
     
     def extract_cells(self, notebook_path: str) -> List[Dict]:
+        # Only cell_type and source are needed, so skip nbformat's schema validation
         with open(notebook_path, 'r', encoding='utf-8') as f:
-            nb = nbformat.read(f, as_version=4)
-        return [{'type': cell.cell_type, 'content': cell.source} for cell in nb.cells]
+            nb = json.load(f)
+        if nb.get('nbformat', 4) < 4:
+            nb = nbformat.convert(nbformat.from_dict(nb), 4)
+        return [
+            {
+                'type': cell['cell_type'],
+                'content': ''.join(cell['source']) if isinstance(cell['source'], list) else cell['source']
+            }
+            for cell in nb['cells']
+        ]
     
     def get_notebook_overview(self, cells: List[Dict]) -> str:
         """Generate an overview of what the notebook does"""
@@ -44,41 +86,9 @@ class NotebookDocumenter:
         except Exception as e:
             return "# Jupyter Notebook Documentation\n\n*Error generating overview*"
 
-    def generate_cell_doc(self, cell_content: str, full_context: str) -> str:
+    def generate_cell_doc(self, cell_content: str, prompt_prefix: str) -> str:
         """Generate natural documentation for a code cell"""
-        prompt = f"""As an expert data scientist documenting your work, briefly explain what this code does in the context of the notebook's workflow. 
-        Write naturally as if documenting your own work, not as an AI, 
-        if it is null cell dont generate anything and generate text based on complexity and length of the code present in the cell.
-
-        Full notebook context:
-        ```python
-        {full_context}
-        ```
-
-        Current code:
-        ```python
-        {cell_content}
-        ```
-
-       Requirements:
-       - Write in third person technical documentation style
-       - No "This code..." or "Here we..." phrases
-       - Be extremely concise - even one phrase is fine if it captures the point
-       - Focus only on meaningful operations
-       - Mention variable names only if crucial
-       - Skip obvious operations
-
-       Example good responses:
-       - "Normalizes features using StandardScaler"
-       - "Extracts timestamp from log entries for temporal analysis"
-       - "Merges preprocessed datasets on user_id"
-       - "Custom function to handle missing GPS coordinates"
-
-       Example bad responses:
-       - "This code performs..."
-       - "Here we can see..."
-       - "This cell is about..."
-       - Any obvious/redundant explanations"""
+        prompt = prompt_prefix + f"\n\nCurrent code:\n```python\n{cell_content}\n```\n" + PROMPT_TEMPLATE_TAIL
 
         try:
             response = self.client.chat.completions.create(
@@ -106,11 +116,12 @@ class NotebookDocumenter:
         full_context = "\n\n".join([
             cell['content'] for cell in cells if cell['type'] == 'code'
         ])
+        prompt_prefix = PROMPT_TEMPLATE_HEAD.format(full_context=full_context)
         
         # Process each cell
         for cell in cells:
             if cell['type'] == 'code' and cell['content'].strip():
-                doc = self.generate_cell_doc(cell['content'], full_context)
+                doc = self.generate_cell_doc(cell['content'], prompt_prefix)
                 if doc:
                     new_nb.cells.append(new_markdown_cell(doc))
                 new_nb.cells.append(new_code_cell(cell['content']))
@@ -1,32 +1,197 @@
 import streamlit as st
 import nbformat
 from nbformat.v4 import new_notebook, new_markdown_cell, new_code_cell
-from groq import Groq
+from groq import (
+    Groq, AsyncGroq, RateLimitError, BadRequestError,
+    APIConnectionError, APITimeoutError, InternalServerError
+)
+import asyncio
+import threading
 import os
-from typing import List, Dict
+from typing import List, Dict, Tuple
 from dotenv import load_dotenv
 import requests
+from requests.adapters import HTTPAdapter
+import urllib3
+from urllib3.util.retry import Retry
 import json
+import orjson
 from io import BytesIO
 import re
+import time
+import random
+import hashlib
+import tempfile
+from pathlib import Path
+from collections import OrderedDict
 
 load_dotenv()
 
+# Errors worth retrying; the async client's own retries are disabled in favour of _with_backoff
+_RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+# Shared keep-alive session for Colab/Drive downloads
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=4,
+    max_retries=Retry(total=2, backoff_factor=0.3)
+))
+
+# Ways a Drive file ID appears in Colab share links, tried in order
+_COLAB_ID_PATTERNS = [re.compile(p) for p in (
+    r'/d/([a-zA-Z0-9-_]+)',  # Matches /d/xxx format
+    r'drive/([a-zA-Z0-9-_]+)',  # Matches drive/xxx format
+    r'/([a-zA-Z0-9-_]{20,})',  # Matches any long alphanumeric string
+)]
+
+# Notebooks with less code than this get a stock overview instead of an LLM call
+MIN_OVERVIEW_CODE_CHARS = 200
+# Cells with fewer non-whitespace characters than this are not worth documenting
+MIN_CELL_DOC_CHARS = 10
+
+CELL_DOC_MODEL = "llama3-8b-8192"
+# Bump whenever the cell documentation prompt changes so cached docs are regenerated
+PROMPT_VERSION = "v7"
+# In-memory docs kept per documenter before the least recently used are dropped
+MAX_MEMORY_CACHE_ENTRIES = 2048
+# Documenters (one per API key) kept alive across Streamlit reruns
+MAX_CACHED_DOCUMENTERS = 8
+# Minimum seconds between progress bar redraws
+PROGRESS_UPDATE_INTERVAL = 0.25
+# Hard cap on the notebook digest sent alongside every cell documentation request
+MAX_CONTEXT_DIGEST_CHARS = 6000
+# Cells documented per request; keeps the JSON reply well inside the context window
+CELL_DOC_BATCH_SIZE = 8
+
+CELL_DOC_RULES = """As an expert data scientist documenting your work, briefly explain what the given code does in the context of the notebook's workflow.
+Write naturally as if documenting your own work, not as an AI,
+if it is null cell dont generate anything and generate text based on complexity and length of the code present in the cell.
+
+Requirements:
+- Write in third person technical documentation style
+- No "This code..." or "Here we..." phrases
+- Be extremely concise - even one phrase is fine if it captures the point
+- Focus only on meaningful operations
+- Mention variable names only if crucial
+- Skip obvious operations.
+
+Example good responses:
+- "Normalizes features using StandardScaler"
+- "Extracts timestamp from log entries for temporal analysis"
+- "Merges preprocessed datasets on user_id"
+- "Custom function to handle missing GPS coordinates"
+
+Example bad responses:
+- "This code performs..."
+- "Here we can see..."
+- "This cell is about..."
+- " The code .."
+- Any obvious/redundant explanations"""
+
+# The notebook digest is sent once per request as a stable system message; only the cell changes
+CELL_DOC_SYSTEM_PROMPT = """Notebook overview and outline:
+{context_digest}
+
+You will be shown cells from this notebook; produce concise docs per the rules below:
+{rules}"""
+
+CELL_DOC_BATCH_PROMPT = """Document each of the following cells.
+Respond with strict JSON: {{"docs": [{{"id": 0, "doc": "..."}}, ...]}} with one entry per cell id (0 to {last_id}).
+
+{cells}"""
+
+def is_trivial_cell(cell_content: str) -> bool:
+    """Check whether a cell is too small or obvious to need documentation"""
+    if len("".join(cell_content.split())) < MIN_CELL_DOC_CHARS:
+        return True
+    lines = [line.strip() for line in cell_content.splitlines()]
+    code_lines = [line for line in lines if line and not line.startswith('#')]
+    return all(line.startswith(('import ', 'from ')) for line in code_lines)
+
+def loads_notebook_json(data):
+    """Parse notebook JSON with orjson, falling back to json for NaN/Infinity or a BOM"""
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        # nbformat itself writes NaN/Infinity, which orjson rejects
+        return json.loads(data)
+
+def check_notebook_shape(nb):
+    """Reject parsed JSON that is not a Jupyter notebook"""
+    if not isinstance(nb, dict) or not isinstance(nb.get('cells', nb.get('worksheets')), list):
+        raise ValueError("File is not a Jupyter notebook")
+
+class ThrottledPlaceholder:
+    """Wrap a Streamlit placeholder so it redraws at most every PROGRESS_UPDATE_INTERVAL"""
+    def __init__(self, placeholder):
+        self._placeholder = placeholder
+        self._last_update = 0.0
+
+    def markdown(self, text: str):
+        now = time.monotonic()
+        if now - self._last_update > PROGRESS_UPDATE_INTERVAL:
+            self._placeholder.markdown(text)
+            self._last_update = now
+
+    def empty(self):
+        self._placeholder.empty()
+
 class NotebookDocumenter:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, max_concurrency: int = 20, max_retries: int = 5):
         self.client = Groq(api_key=api_key)
+        # _complete_with_backoff is the only retry path, so the SDK never sleeps while holding a slot
+        self.aclient = AsyncGroq(api_key=api_key, max_retries=0)
+        self._sem = asyncio.Semaphore(max_concurrency)
+        self.max_retries = max_retries
+        self._cache_dir = Path(".notebook_ai_cache")
+        self._memory_cache: "OrderedDict[str, str]" = OrderedDict()
+        # The async client's connection pool is tied to the loop it first ran on,
+        # so every run goes through one long-lived loop instead of asyncio.run
+        self._loop = asyncio.new_event_loop()
+        self._loop_lock = threading.Lock()
+
+    def run(self, coro):
+        """Run a coroutine on this documenter's event loop"""
+        with self._loop_lock:
+            task = self._loop.create_task(coro)
+            try:
+                return self._loop.run_until_complete(task)
+            finally:
+                # The loop outlives this run, so batches left behind by a failure
+                # must not resume (and keep calling Groq) during the next one
+                leftovers = [t for t in asyncio.all_tasks(self._loop) if not t.done()]
+                for leftover in leftovers:
+                    leftover.cancel()
+                if leftovers:
+                    self._loop.run_until_complete(asyncio.gather(*leftovers, return_exceptions=True))
     
     def extract_cells(self, notebook_content) -> List[Dict]:
         """Extract cells from notebook content"""
-        if isinstance(notebook_content, str):
-            nb = nbformat.reads(notebook_content, as_version=4)
+        # Only cell_type and source are needed, so skip nbformat's schema validation
+        if isinstance(notebook_content, (str, bytes)):
+            nb = loads_notebook_json(notebook_content)
         else:
             nb = notebook_content
-        return [{'type': cell.cell_type, 'content': cell.source} for cell in nb.cells]
+        check_notebook_shape(nb)
+        if nb.get('nbformat', 4) < 4:
+            nb = nbformat.convert(nbformat.from_dict(nb), 4)
+        return [
+            {
+                'type': cell['cell_type'],
+                'content': ''.join(cell['source']) if isinstance(cell['source'], list) else cell['source']
+            }
+            for cell in nb['cells']
+        ]
     
-    def get_notebook_overview(self, cells: List[Dict]) -> str:
+    def get_notebook_overview(self, cells: List[Dict], placeholder=None) -> str:
         """Generate an overview of what the notebook does"""
-        all_code = "\n".join([cell['content'] for cell in cells if cell['type'] == 'code'])
+        code_cells = [cell for cell in cells if cell['type'] == 'code']
+        all_code = "\n".join([cell['content'] for cell in code_cells])
+        if not all_code.strip():
+            return "# Notebook Documentation"
+        if len(all_code) < MIN_OVERVIEW_CODE_CHARS:
+            return f"# Notebook\n\nShort notebook with {len(code_cells)} code cells."
         
         prompt = """Understand this Jupyter notebook code and provide:
         1. Start with generating a title describing the notebook's purpose , and dont write "Title:"
@@ -47,111 +212,280 @@ class NotebookDocumenter:
                 temperature=0.7,
                 max_tokens=300,
                 top_p=1,
-                stream=False
+                stream=True
             )
-            return response.choices[0].message.content.strip()
+            overview = ""
+            for chunk in response:
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    overview += delta
+                    if placeholder is not None:
+                        placeholder.markdown(overview)
+            return overview.strip()
         except Exception as e:
             return f"# Jupyter Notebook Documentation\n\n*Error generating overview: {str(e)}*"
  
-    def generate_cell_doc(self, cell_content: str, full_context: str) -> str:
+    def build_context_digest(self, cells: List[Dict], overview: str) -> str:
+        """Summarize the notebook as its overview plus the first line of each code cell"""
+        # Outline entries are unnumbered so they can't be confused with batch cell ids
+        outline = []
+        for cell in cells:
+            if cell['type'] != 'code':
+                continue
+            first_line = next((line.strip() for line in cell['content'].splitlines() if line.strip()), None)
+            if first_line:
+                outline.append(f"- {first_line}")
+        digest = overview + "\n\n" + "\n".join(outline)
+        return digest[:MAX_CONTEXT_DIGEST_CHARS]
+
+    def build_context_message(self, context_digest: str) -> Dict:
+        """Build the system message shared by every cell of a notebook"""
+        return {
+            "role": "system",
+            "content": CELL_DOC_SYSTEM_PROMPT.format(context_digest=context_digest, rules=CELL_DOC_RULES)
+        }
+
+    async def generate_cell_doc(self, cell_content: str, context_message: Dict, placeholder=None, label: str = "") -> str:
         """Generate natural documentation for a code cell"""
-        if not cell_content.strip():
+        if is_trivial_cell(cell_content):
             return ""
+
+        key = self._cache_key(cell_content)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
             
-        prompt = f"""As an expert data scientist documenting your work, briefly explain what this code does in the context of the notebook's workflow. 
-        Write naturally as if documenting your own work, not as an AI, 
-        if it is null cell dont generate anything and generate text based on complexity and length of the code present in the cell.
+        try:
+            on_text = None
+            if placeholder is not None:
+                # Concurrent cells share one live preview, so say which cell is being written
+                on_text = lambda text: placeholder.markdown(f"**{label}** {text}" if label else text)
+            doc = await self._stream_with_backoff(
+                on_text,
+                model=CELL_DOC_MODEL,
+                messages=[context_message, {"role": "user", "content": cell_content}],
+                temperature=0.6,
+                max_tokens=100,
+                top_p=1
+            )
+            doc = doc.strip()
+        except Exception as e:
+            return f"*Error generating documentation: {str(e)}*"
 
-        Full notebook context:
-        ```python
-        {full_context}
-        ```
+        self._cache_put(key, doc)
+        return doc
 
-        Current code:
-        ```python
-        {cell_content}
-        ```
-
-       Requirements:
-       - Write in third person technical documentation style
-       - No "This code..." or "Here we..." phrases
-       - Be extremely concise - even one phrase is fine if it captures the point
-       - Focus only on meaningful operations
-       - Mention variable names only if crucial
-       - Skip obvious operations.
-
-       Example good responses:
-       - "Normalizes features using StandardScaler"
-       - "Extracts timestamp from log entries for temporal analysis"
-       - "Merges preprocessed datasets on user_id"
-       - "Custom function to handle missing GPS coordinates"
-
-       Example bad responses:
-       - "This code performs..."
-       - "Here we can see..."
-       - "This cell is about..."
-       - " The code .."
-       - Any obvious/redundant explanations       
-       """
-        
+    def _cache_key(self, cell_content: str) -> str:
+        """Hash a cell together with the model and prompt version"""
+        payload = f"{PROMPT_VERSION}\0{CELL_DOC_MODEL}\0{cell_content}"
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
 
+    def _cache_get(self, key: str):
+        """Look up a cached doc in memory, then on disk"""
+        if key in self._memory_cache:
+            self._memory_cache.move_to_end(key)
+            return self._memory_cache[key]
         try:
-            response = self.client.chat.completions.create(
-                model="llama3-8b-8192",
-                messages=[{"role": "user", "content": prompt}],
+            doc = (self._cache_dir / f"{key}.txt").read_text(encoding='utf-8')
+        except (OSError, UnicodeDecodeError):
+            # Missing, unreadable or corrupt entries are all just cache misses
+            return None
+        self._remember(key, doc)
+        return doc
+
+    def _remember(self, key: str, doc: str):
+        """Keep a doc in the bounded in-memory LRU"""
+        self._memory_cache[key] = doc
+        self._memory_cache.move_to_end(key)
+        while len(self._memory_cache) > MAX_MEMORY_CACHE_ENTRIES:
+            self._memory_cache.popitem(last=False)
+
+    def _cache_put(self, key: str, doc: str):
+        """Store a doc in memory and atomically on disk"""
+        self._remember(key, doc)
+        tmp_path = None
+        try:
+            self._cache_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self._cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(doc)
+            os.replace(tmp_path, self._cache_dir / f"{key}.txt")
+        except (OSError, UnicodeEncodeError):
+            # The disk cache is best-effort; the in-memory copy still serves this session
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+
+    async def generate_cell_docs_batch(self, cells_subset: List[Tuple[int, str]], context_message: Dict, placeholder=None) -> Dict[int, str]:
+        """Document several code cells with a single JSON completion"""
+        docs = {}
+        pending = []
+        for cell_id, content in cells_subset:
+            if is_trivial_cell(content):
+                docs[cell_id] = ""
+                continue
+            cached = self._cache_get(self._cache_key(content))
+            if cached is not None:
+                docs[cell_id] = cached
+            else:
+                pending.append((cell_id, content))
+
+        if len(pending) <= 1:
+            for cell_id, content in pending:
+                docs[cell_id] = await self.generate_cell_doc(content, context_message, placeholder, f"Cell {cell_id}:")
+            return docs
+
+        # Cells are numbered by position in the batch and mapped back to notebook indices
+        prompt = CELL_DOC_BATCH_PROMPT.format(
+            last_id=len(pending) - 1,
+            cells="\n".join(f"### CELL {position}\n{content}" for position, (_, content) in enumerate(pending))
+        )
+        try:
+            response = await self._complete_with_backoff(
+                model=CELL_DOC_MODEL,
+                messages=[context_message, {"role": "user", "content": prompt}],
                 temperature=0.6,
-                max_tokens=100,
+                max_tokens=100 * len(pending),
                 top_p=1,
-                stream=False
+                stream=False,
+                response_format={"type": "json_object"}
             )
-            return response.choices[0].message.content.strip()
+            content = response.choices[0].message.content
+        except BadRequestError:
+            # Groq answers invalid model JSON (or an unsupported response_format) with a 400,
+            # so the whole batch is retried cell by cell below
+            content = None
         except Exception as e:
-            return f"*Error generating documentation: {str(e)}*"
+            for cell_id, _ in pending:
+                docs[cell_id] = f"*Error generating documentation: {str(e)}*"
+            return docs
+
+        batch_docs = {}
+        try:
+            parsed = json.loads(content)
+            seen = set()
+            for item in parsed['docs']:
+                position = int(item['id'])
+                if position in seen:
+                    # An id answered twice is ambiguous, so neither answer is trusted
+                    batch_docs.pop(position, None)
+                else:
+                    batch_docs[position] = str(item['doc']).strip()
+                seen.add(position)
+        except (ValueError, KeyError, TypeError):
+            batch_docs = {}
+
+        # Anything the model skipped or mangled goes through the single-cell path
+        fallback = []
+        for position, (cell_id, content) in enumerate(pending):
+            if position in batch_docs:
+                docs[cell_id] = batch_docs[position]
+                self._cache_put(self._cache_key(content), batch_docs[position])
+            else:
+                fallback.append((cell_id, content))
+        results = await asyncio.gather(*[
+            self.generate_cell_doc(content, context_message, placeholder, f"Cell {cell_id}:")
+            for cell_id, content in fallback
+        ])
+        docs.update(zip([cell_id for cell_id, _ in fallback], results))
+        return docs
+
+    async def _complete_with_backoff(self, **kwargs):
+        """Run a chat completion under the concurrency limit, backing off on retryable errors"""
+        return await self._with_backoff(lambda: self.aclient.chat.completions.create(**kwargs))
+
+    async def _stream_with_backoff(self, on_text=None, **kwargs) -> str:
+        """Stream a chat completion to the end under the concurrency limit and return its text"""
+        async def consume():
+            response = await self.aclient.chat.completions.create(stream=True, **kwargs)
+            text = ""
+            async for chunk in response:
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    text += delta
+                    if on_text is not None:
+                        on_text(text)
+            return text
+
+        # The body is read inside the slot, so streamed generations still count against max_concurrency
+        return await self._with_backoff(consume)
 
-    def create_documented_notebook(self, notebook_content) -> nbformat.notebooknode.NotebookNode:
+    async def _with_backoff(self, request):
+        """Await request() while holding a semaphore slot, retrying rate limits and transient failures"""
+        delay = 1.0
+        for attempt in range(self.max_retries + 1):
+            async with self._sem:
+                try:
+                    return await request()
+                except _RETRYABLE_ERRORS:
+                    if attempt == self.max_retries:
+                        raise
+            # Sleep outside the semaphore so other cells can use the slot meanwhile
+            await asyncio.sleep(delay + random.uniform(0, delay / 2))
+            delay = min(delay * 2, 30.0)
+
+    async def create_documented_notebook(self, notebook_content) -> nbformat.notebooknode.NotebookNode:
         """Create documented notebook with natural writing style"""
         cells = self.extract_cells(notebook_content)
         new_nb = new_notebook()
         
         # Get notebook overview
+        overview_placeholder = ThrottledPlaceholder(st.empty())
         with st.spinner('Generating notebook overview...'):
-            overview = self.get_notebook_overview(cells)
+            overview = self.get_notebook_overview(cells, overview_placeholder)
             new_nb.cells.append(new_markdown_cell(overview))
+        overview_placeholder.empty()
         
-        # Full context for reference
-        full_context = "\n\n".join([
-            cell['content'] for cell in cells if cell['type'] == 'code'
-        ])
+        # Compact notebook context for reference; the full code only goes to the overview
+        context_digest = self.build_context_digest(cells, overview)
         
-        # Process each cell
-        total_cells = len(cells)
+        # Identical cells are documented once, under the index of their first occurrence
+        first_seen = {}
+        for idx, cell in enumerate(cells):
+            if cell['type'] == 'code' and cell['content'].strip():
+                first_seen.setdefault(cell['content'], idx)
+        code_cells = [(idx, content) for content, idx in first_seen.items()]
+        
+        # Document code cells in batches, with the batches running concurrently
+        context_message = self.build_context_message(context_digest)
+        doc_placeholder = ThrottledPlaceholder(st.empty())
+        tasks = [
+            self.generate_cell_docs_batch(code_cells[i:i + CELL_DOC_BATCH_SIZE], context_message, doc_placeholder)
+            for i in range(0, len(code_cells), CELL_DOC_BATCH_SIZE)
+        ]
+        
+        # Track actual batch completions, redrawing the bar at most every PROGRESS_UPDATE_INTERVAL
         progress_bar = st.progress(0)
+        last_update = time.monotonic()
+        docs = {}
+        for done, batch in enumerate(asyncio.as_completed(tasks), start=1):
+            docs.update(await batch)
+            if time.monotonic() - last_update > PROGRESS_UPDATE_INTERVAL:
+                progress_bar.progress(done / len(tasks))
+                last_update = time.monotonic()
+        progress_bar.progress(1.0)
+        doc_placeholder.empty()
         
-        for idx, cell in enumerate(cells):
+        # Process each cell
+        for cell in cells:
             if cell['type'] == 'code' and cell['content'].strip():
-                doc = self.generate_cell_doc(cell['content'], full_context)
+                doc = docs[first_seen[cell['content']]]
                 if doc:
                     new_nb.cells.append(new_markdown_cell(doc))
                 new_nb.cells.append(new_code_cell(cell['content']))
             elif cell['type'] == 'markdown':
                 new_nb.cells.append(new_markdown_cell(cell['content']))
-                
-            progress_bar.progress((idx + 1) / total_cells)
         
         return new_nb
 
 def download_colab_notebook(colab_url: str) -> dict:
     """Download notebook from Google Colab URL"""
     # Extract the file ID from the Colab URL using more flexible pattern matching
-    patterns = [
-        r'/d/([a-zA-Z0-9-_]+)',  # Matches /d/xxx format
-        r'drive/([a-zA-Z0-9-_]+)',  # Matches drive/xxx format
-        r'\/([a-zA-Z0-9-_]{20,})',  # Matches any long alphanumeric string
-    ]
-    
     file_id = None
-    for pattern in patterns:
-        match = re.search(pattern, colab_url)
+    for pattern in _COLAB_ID_PATTERNS:
+        match = pattern.search(colab_url)
         if match:
             file_id = match.group(1)
             break
@@ -165,16 +499,25 @@ def download_colab_notebook(colab_url: str) -> dict:
         f"https://drive.google.com/uc?export=download&id={file_id}"
     ]
     
+    # A HEAD probe can't tell a notebook from Drive's HTML interstitial, so just GET each candidate
     for download_url in download_urls:
         try:
-            response = requests.get(download_url)
-            if response.status_code == 200:
-                try:
-                    # Try to parse the notebook content
-                    return nbformat.reads(response.content.decode('utf-8'), as_version=4)
-                except:
+            with _SESSION.get(download_url, stream=True, timeout=(3, 30)) as response:
+                if response.status_code != 200:
                     continue
-        except:
+                # orjson takes the bytes directly, so no decoded text copy is made
+                data = response.raw.read(decode_content=True)
+        except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError):
+            continue
+        
+        try:
+            # Try to parse the notebook content
+            nb = loads_notebook_json(data)
+            # from_dict accepts any JSON, so reject error objects and the like here
+            check_notebook_shape(nb)
+            return nbformat.from_dict(nb)
+        except ValueError:
+            # Not JSON, e.g. a Drive interstitial page; try the next URL
             continue
     
     # If we get here, none of the attempts worked
@@ -185,6 +528,11 @@ def download_colab_notebook(colab_url: str) -> dict:
     
     Please make sure the notebook is publicly accessible and try again.""")
 
+@st.cache_resource(max_entries=MAX_CACHED_DOCUMENTERS)
+def get_documenter(api_key: str) -> NotebookDocumenter:
+    """Share one documenter, and its Groq connection pools, across reruns"""
+    return NotebookDocumenter(api_key)
+
 def main():
     st.set_page_config(page_title="Notebook Documenter", layout="wide")
     
@@ -221,12 +569,12 @@ def main():
     )
 
     try:
-        documenter = NotebookDocumenter(api_key)
+        documenter = get_documenter(api_key)
         
         if input_method == "Upload Notebook":
             uploaded_file = st.file_uploader("Choose a notebook file", type=['ipynb'])
             if uploaded_file:
-                notebook_content = nbformat.read(uploaded_file, as_version=4)
+                notebook_content = uploaded_file.getvalue()
                 process_notebook = True
             else:
                 process_notebook = False
@@ -253,10 +601,11 @@ def main():
             if st.button("Generate Documentation"):
                 try:
                     with st.spinner('Generating documentation...'):
-                        documented_nb = documenter.create_documented_notebook(notebook_content)
+                        documented_nb = documenter.run(documenter.create_documented_notebook(notebook_content))
                         
-                        # Convert notebook to string for download
-                        notebook_str = nbformat.writes(documented_nb)
+                        # Validate once, then serialize for download with orjson
+                        nbformat.validate(documented_nb)
+                        notebook_str = orjson.dumps(documented_nb, option=orjson.OPT_INDENT_2)
                         
                         # Create download button
                         st.download_button(